@@ -0,0 +1,193 @@
+import glob
+import os
+import platform
+import re
+import threading
+import time
+
+from camera_handler.video_audio import MultiCamManager, parse_source, share_fps_budget, _dbg
+
+_VIDEO_NODE = re.compile(r"^/dev/video(\d+)$")
+
+def _scan_video_nodes():
+    """índices dos /dev/videoN presentes (só Linux/V4L2)"""
+    found = set()
+    for path in glob.glob("/dev/video*"):
+        m = _VIDEO_NODE.match(path)
+        if m:
+            found.add(int(m.group(1)))
+    return found
+
+class CameraRegistry(MultiCamManager):
+    """
+    registo dinâmico de câmaras (sem limite fixo de 4)
+    fontes USB/V4L2 e de rede (URL) adicionadas/removidas em runtime
+    hot-plug: vigia /dev/video* e abre/fecha streams sem reiniciar
+    orçamento de CPU: reparte um total de FPS de captura pelas fontes
+    os slots são estáveis (cam_id do TX/snapshots não muda quando uma sai)
+    """
+    def __init__(self, *, hotplug=False, fps_budget=0, poll_interval=2.0, open_retries=3, **kwargs):
+        super().__init__(**kwargs)
+        # sem --devs os slots vêm de range(max_cameras): os que não abrem ficam livres
+        self._auto_indices = not kwargs.get("device_indices")
+        self.hotplug = bool(hotplug) and platform.system() == "Linux" and os.path.isdir("/dev")
+        self.fps_budget = float(fps_budget or 0)
+        self.poll_interval = float(poll_interval)
+        # tentativas por nó /dev/video novo (corrida do udev com as permissões, nós de metadados)
+        self.open_retries = int(open_retries)
+
+        self._lock = threading.RLock()
+        self._thr = None
+        self._running = False
+        self._known_nodes = set()
+        self._retries = {}
+
+    def start_all(self):
+        with self._lock:
+            super().start_all()
+            if self._auto_indices:
+                self.device_indices = [d if s is not None else None
+                                       for d, s in zip(self.device_indices, self.streams)]
+                self._auto_indices = False
+            if self.hotplug:
+                # nós já presentes ficam conhecidos, exceto os de slots reservados que falharam
+                # (esses são tentados de novo pelo watcher)
+                pending = {d for d, s in zip(self.device_indices, self.streams)
+                           if s is None and isinstance(d, int)}
+                self._known_nodes = _scan_video_nodes() - pending
+                self._retries = {}
+            self._rebalance()
+        if (self.hotplug or self.fps_budget > 0) and not self._running:
+            self._running = True
+            self._thr = threading.Thread(target=self._watch_loop, daemon=True)
+            self._thr.start()
+        return self.streams
+
+    def stop_all(self):
+        # _running muda antes do lock: um scan do watcher que esteja à espera do lock
+        # vê-o a False (em _scan_hotplug) e já não abre streams novas
+        self._running = False
+        with self._lock:
+            super().stop_all()
+
+    def _watcher_active(self):
+        return self._running and self._thr is threading.current_thread()
+
+    def add_source(self, src, backend=None):
+        """abre uma fonte num slot livre; devolve o slot ou None"""
+        src = parse_source(src)
+        with self._lock:
+            devs = [parse_source(d) if d is not None else None for d in self.device_indices]
+            streams = list(self.streams) + [None] * (len(devs) - len(self.streams))
+            for slot, (dev, s) in enumerate(zip(devs, streams)):
+                if dev == src and s is not None:
+                    return slot
+            # 1) slot que já foi desta fonte, 2) slot vazio, 3) slot novo
+            # (slots reservados para outra fonte nunca são dados)
+            slot = next((i for i, d in enumerate(devs) if d == src), None)
+            if slot is None:
+                slot = next((i for i, d in enumerate(devs) if d is None), None)
+            if slot is None and len(devs) < self.max_cameras:
+                devs.append(None)
+                streams.append(None)
+                slot = len(devs) - 1
+            if slot is None:
+                _dbg(f"[Registry] Sem slots livres para {src} (max={self.max_cameras})")
+                return None
+
+            if backend is None and slot < len(self.backends):
+                backend = self.backends[slot]
+            stream = self._open(src, backend)
+            if stream is None:
+                return None
+            devs[slot] = src
+            streams[slot] = stream
+            self.device_indices = devs
+            # nova lista (copy-on-write): quem está a iterar a antiga não é afetado
+            self.streams = streams
+            self._rebalance()
+            _dbg(f"[Registry] Fonte {src} adicionada no slot {slot}")
+            return slot
+
+    def remove_source(self, src, forget=False):
+        """
+        fecha a stream da fonte; o slot fica reservado para quando ela voltar
+        forget=True liberta também o slot (remoção pedida pelo utilizador)
+        """
+        src = parse_source(src)
+        with self._lock:
+            for slot, s in enumerate(self.streams):
+                if s is not None and s.camera_index == src:
+                    return self.remove_slot(slot, forget=forget)
+        return None
+
+    def remove_slot(self, slot, forget=False):
+        """fecha a stream de um slot; devolve o slot ou None se já estava vazio"""
+        with self._lock:
+            if not 0 <= slot < len(self.streams):
+                return None
+            streams = list(self.streams)
+            s = streams[slot]
+            streams[slot] = None
+            self.streams = streams
+            src = self.device_indices[slot] if slot < len(self.device_indices) else None
+            if forget and src is not None:
+                devs = list(self.device_indices)
+                devs[slot] = None
+                self.device_indices = devs
+            if s is None and not forget:
+                return None
+            if s is not None:
+                s.stop()
+            self._rebalance()
+            _dbg(f"[Registry] Fonte {src} removida do slot {slot}")
+            return slot
+
+    def _rebalance(self):
+        """reparte o orçamento de FPS pelas streams ativas"""
+        live = [s for s in self.streams if s is not None]
+        if self.fps_budget <= 0 or not live:
+            for s in live:
+                s.set_capture_fps(None)
+            return
+        alloc = share_fps_budget(self.fps_budget, {id(s): s.wanted_fps() for s in live})
+        for s in live:
+            s.set_capture_fps(alloc[id(s)])
+
+    def _scan_hotplug(self):
+        nodes = _scan_video_nodes()
+        with self._lock:
+            # depois de um stop_all (ou reload, que cria outro watcher) este scan já não conta
+            if not self._watcher_active():
+                return
+            self._apply_scan(nodes)
+
+    def _apply_scan(self, nodes):
+        for idx in sorted(self._known_nodes - nodes):
+            self.remove_source(idx)
+        self._known_nodes &= nodes
+        self._retries = {i: n for i, n in self._retries.items() if i in nodes}
+        # um nó só fica conhecido depois de abrir; falhas repetem até open_retries
+        # (nós de metadados V4L2 desistem aí até desaparecerem e voltarem)
+        for idx in sorted(nodes - self._known_nodes):
+            tries = self._retries.get(idx, 0)
+            if tries >= self.open_retries:
+                continue
+            if self.add_source(idx) is not None:
+                self._known_nodes.add(idx)
+                self._retries.pop(idx, None)
+            else:
+                self._retries[idx] = tries + 1
+
+    def _watch_loop(self):
+        # um reload (stop_all + start_all) cria um watcher novo; o antigo sai
+        while self._watcher_active():
+            try:
+                if self.hotplug:
+                    self._scan_hotplug()
+                with self._lock:
+                    self._rebalance()
+            except Exception as e:
+                _dbg(f"[Registry] Erro no watcher: {e}")
+            time.sleep(self.poll_interval)
+        _dbg("[Registry] Watcher terminado.")
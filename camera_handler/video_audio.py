@@ -1,4 +1,5 @@
 import cv2
+import math
 import platform
 import threading
 import time
@@ -22,20 +23,108 @@ def _backend_code(name: str) -> int:
         "dshow": getattr(cv2, "CAP_DSHOW", 0),
         "msmf": getattr(cv2, "CAP_MSMF", 0),
         "v4l2": getattr(cv2, "CAP_V4L2", 0),
+        "ffmpeg": getattr(cv2, "CAP_FFMPEG", 0),
     }
     return MAP.get(name, 0)
 
+def parse_source(src):
+    """índice de câmara ('0' -> 0) ou URL (rtsp://..., http://...) para o cv2.VideoCapture"""
+    if isinstance(src, int):
+        return src
+    src = str(src).strip()
+    return int(src) if src.isdigit() else src
+
+def share_fps_budget(budget, wants):
+    """
+    divide um orçamento total de FPS pelas fontes (water-filling)
+    wants: {chave: fps pedido}; quem pede menos que a quota fica com o que pede
+    e o que sobra é repartido pelas restantes
+    """
+    alloc = {}
+    remaining = float(budget)
+    pending = sorted(wants.items(), key=lambda kv: kv[1])
+    while pending:
+        share = remaining / len(pending)
+        key, want = pending[0]
+        if want > share:
+            for key, _ in pending:
+                alloc[key] = share
+            break
+        alloc[key] = want
+        remaining -= want
+        pending.pop(0)
+    return alloc
+
+# saídas de cada câmara; cada uma pode ter o seu perfil (ROI, escala, FPS)
+# "snapshot" é sempre o frame inteiro (resolução total da captura)
+OUTPUTS = ("display", "tx", "record", "snapshot")
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def parse_profile(spec):
+    """
+    normaliza um perfil de saída vindo do cctv.config.json
+    {"crop": [x, y, w, h], "scale": 0.5, "fps": 5}  (tudo opcional)
+    ValueError se o perfil for inválido
+    """
+    spec = spec or {}
+    if not isinstance(spec, dict):
+        raise ValueError("o perfil tem de ser um objeto {crop, scale, fps}")
+    crop = spec.get("crop")
+    if crop:
+        if not isinstance(crop, (list, tuple)) or len(crop) != 4 or not all(_is_number(v) for v in crop):
+            raise ValueError(f"crop tem de ser [x, y, largura, altura] numérico (recebido {crop!r})")
+        x, y, w, h = (int(v) for v in crop)
+        crop = (max(0, x), max(0, y), max(1, w), max(1, h))
+    else:
+        crop = None
+    scale = spec.get("scale") or 1.0
+    if not _is_number(scale) or scale <= 0:
+        raise ValueError(f"scale tem de ser um número > 0 (recebido {scale!r})")
+    fps = spec.get("fps") or 0.0
+    if not _is_number(fps) or fps < 0:
+        raise ValueError(f"fps tem de ser um número >= 0 (recebido {fps!r})")
+    return {"crop": crop, "scale": float(scale), "fps": float(fps)}
+
+def _next_deadline(deadline, period, now):
+    """próximo instante de emissão; se ficou para trás, recomeça a partir de agora"""
+    nxt = deadline + period
+    return nxt if nxt > now else now + period
+
+def _apply_profile(frame, prof):
+    """recorta e escala um frame segundo o perfil (None se a ROI ficar fora da imagem)"""
+    crop = prof["crop"]
+    if crop is not None:
+        x, y, w, h = crop
+        frame = frame[y:y+h, x:x+w]
+        if frame.size == 0:
+            return None
+    scale = prof["scale"]
+    if scale != 1.0:
+        h, w = frame.shape[:2]
+        nw, nh = max(1, int(w*scale)), max(1, int(h*scale))
+        interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (nw, nh), interpolation=interp)
+    elif crop is not None:
+        # copia só a ROI (a view prendia o frame inteiro em memória)
+        frame = frame.copy()
+    return frame
+
 class CameraStream:
     """
     vai fazer captura de camara com thread
     mantem SEMPRE o último frame (anti-flicker)
-    backend configuravel por camara (dshow/msmf/v4l2/auto) 
+    fonte: índice de câmara (USB/V4L2) ou URL de rede (RTSP/HTTP)
+    backend configuravel por camara (dshow/msmf/v4l2/ffmpeg/auto)
     opcional: forçar MJPG
+    perfis por saída (display/tx/record): ROI, escala e FPS aplicados na
+    thread de captura, antes de qualquer cópia ou encode
     """
-    def __init__(self, camera_index: int, *, width=None, height=None, fps=None,
-                 backend: str = None, force_mjpg: bool = False,
+    def __init__(self, camera_index, *, width=None, height=None, fps=None,
+                 backend: str = None, force_mjpg: bool = False, profiles=None,
                  audio_index=None, enable_audio=False, debug=False):
-        self.camera_index = int(camera_index)
+        self.camera_index = parse_source(camera_index)
         self.width = width
         self.height = height
         self.fps = fps
@@ -48,14 +137,34 @@ class CameraStream:
 
         self.cap = None
         self.running = False
+        self._video_thr = None
+
+        # perfis por saída (sem perfil -> frame inteiro, sem decimação)
+        profiles = profiles or {}
+        self.profiles = {out: parse_profile(profiles.get(out)) for out in OUTPUTS}
+        self.profiles["snapshot"] = parse_profile(None)
 
-        # ultimo frame persistente
-        self._last_frame = None
+        # ultimo frame persistente por saída
         self._lock = threading.Lock()
+        self._out_frames = {}
+        self._out_seq = {out: 0 for out in OUTPUTS}
+        self._out_next = {out: 0.0 for out in OUTPUTS}
+        self._taken_seq = {}
+        # só se processam as saídas que alguém já pediu (get_frame)
+        self._active = set()
 
         # métricas
         self._frame_count = 0
+        # limite de captura imposto pelo orçamento de CPU (0 = sem limite)
+        self._cap_period = 0.0
+        self._cap_next = 0.0
+        # V4L2: FPS pedido ao próprio dispositivo (aplicado na thread de captura)
+        self._dev_fps = 0.0
+        self._dev_fps_pending = None
+        # passa a False se o driver recusar (ex.: uvcvideo com EBUSY a meio da stream)
+        self._dev_fps_ok = True
         self._fps_est = 0.0
+        self._fps_reported = 0.0
         self._t0 = 0.0
 
         # audio (opcional)
@@ -73,7 +182,9 @@ class CameraStream:
     def start(self) -> bool:
         # backend default por SO
         if self.backend is None:
-            if platform.system() == "Windows":
+            if isinstance(self.camera_index, str):
+                self.backend = "auto"
+            elif platform.system() == "Windows":
                 self.backend = "dshow"
             elif platform.system() == "Linux":
                 self.backend = "v4l2"
@@ -109,6 +220,8 @@ class CameraStream:
         w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps_reported = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        self._fps_reported = fps_reported
+        self._dev_fps = float(self.fps or 0.0) or fps_reported
         _dbg(f"[Info] C{self.camera_index}: {w}x{h} @ ~{fps_reported:.1f} fps (backend={self.backend})")
 
         # audio opcional
@@ -124,21 +237,35 @@ class CameraStream:
 
         self.running = True
         self._t0 = time.time()
-        threading.Thread(target=self._video_loop, daemon=True).start()
+        self._video_thr = threading.Thread(target=self._video_loop, daemon=True)
+        self._video_thr.start()
         if self.audio_stream is not None:
             threading.Thread(target=self._audio_loop, daemon=True).start()
         return True
 
     def _video_loop(self):
         while self.running:
-            ok, frame = self.cap.read()
+            pending = self._dev_fps_pending
+            if pending is not None:
+                self._dev_fps_pending = None
+                self._set_device_fps(pending)
+            # grab sempre (esvazia o buffer); em USB/V4L2 só os frames dentro do
+            # orçamento são descodificados (no FFMPEG/rede o grab() já descodifica)
+            if not self.cap.grab():
+                time.sleep(0.01)
+                continue
+            if self._cap_period > 0:
+                now = time.time()
+                if now < self._cap_next:
+                    continue
+                self._cap_next = _next_deadline(self._cap_next, self._cap_period, now)
+            ok, frame = self.cap.retrieve()
             if not ok or frame is None:
                 # nao matar a stream (algumas camaras dao falso negativo pontual)
                 time.sleep(0.01)
                 continue
 
-            with self._lock:
-                self._last_frame = frame
+            self._publish(frame)
 
             self._frame_count += 1
             if self._frame_count % 20 == 0:
@@ -148,8 +275,31 @@ class CameraStream:
                     self._fps_est = 20.0 / dt
                 self._t0 = now
 
+        # a thread de captura é dona do cap: só liberta quando já não está dentro do grab()
+        try:
+            if self.cap: self.cap.release()
+        except Exception:
+            pass
         _dbg(f"[Stop] Loop de video interrompido C{self.camera_index}")
 
+    def _publish(self, frame):
+        """aplica decimação + ROI/escala a cada saída ativa e guarda o resultado"""
+        now = time.time()
+        with self._lock:
+            active = tuple(self._active)
+        for out in active:
+            prof = self.profiles[out]
+            if prof["fps"] > 0:
+                if now < self._out_next[out]:
+                    continue
+                self._out_next[out] = _next_deadline(self._out_next[out], 1.0 / prof["fps"], now)
+            img = _apply_profile(frame, prof)
+            if img is None:
+                continue
+            with self._lock:
+                self._out_frames[out] = img
+                self._out_seq[out] += 1
+
     def _audio_loop(self):
         while self.running and self.audio_stream is not None:
             try:
@@ -159,21 +309,79 @@ class CameraStream:
                 break
         _dbg(f"[Stop] Loop de audio interrompido C{self.camera_index}")
 
-    def get_frame(self):
+    def get_frame(self, output="display", only_new=False):
+        """
+        devolve uma cópia do último frame da saída pedida
+        only_new=True -> None se não houve frame novo desde o último pedido
+        """
+        if output not in self.profiles:
+            raise ValueError(f"saída desconhecida: {output}")
+        with self._lock:
+            self._active.add(output)
+            frm = self._out_frames.get(output)
+            if only_new:
+                seq = self._out_seq[output]
+                if seq == self._taken_seq.get(output):
+                    return None
+                self._taken_seq[output] = seq
+            return None if frm is None else frm.copy()
+
+    def wanted_fps(self) -> float:
+        """FPS que as saídas ativas precisam (0 nos perfis = FPS da câmara)"""
         with self._lock:
-            return None if self._last_frame is None else self._last_frame.copy()
+            active = [out for out in self._active if out != "snapshot"] or ["display"]
+        full = float(self.fps or 0.0) or self._fps_reported or 30.0
+        return max(self.profiles[out]["fps"] or full for out in active)
+
+    def set_capture_fps(self, fps):
+        """limita os frames descodificados por segundo (0/None = sem limite)"""
+        self._cap_period = 1.0 / float(fps) if fps else 0.0
+        # em V4L2 pede também menos frames ao dispositivo (só se mudar o suficiente,
+        # alterar o FPS pode reiniciar a stream no driver)
+        if isinstance(self.camera_index, int) and self.backend == "v4l2":
+            target = float(fps or 0.0) or float(self.fps or 0.0)
+            if self.fps:
+                target = min(target, float(self.fps))
+            if self._dev_fps_ok and target > 0 and abs(target - self._dev_fps) >= 0.5:
+                self._dev_fps_pending = target
+
+    def _set_device_fps(self, fps):
+        try:
+            ok = bool(self.cap.set(cv2.CAP_PROP_FPS, float(fps)))
+        except Exception:
+            ok = False
+        if ok:
+            self._dev_fps = float(fps)
+            _dbg(f"[Info] C{self.camera_index}: FPS do dispositivo -> {fps:.1f}")
+        else:
+            # não insiste a cada rebalance; fica só a decimação por software (_cap_period)
+            self._dev_fps_ok = False
+            _dbg(f"[Aviso] C{self.camera_index}: o driver recusou FPS={fps:.1f}; "
+                 f"limite aplicado só por software")
+
+    def is_full_frame(self, output) -> bool:
+        """True se a saída não recorta nem escala (frame com a resolução da captura)"""
+        prof = self.profiles.get(output)
+        return prof is not None and prof["crop"] is None and prof["scale"] == 1.0
 
     def fps_estimate(self) -> float:
         return float(self._fps_est)
 
-    def stop(self):
+    def stop(self, timeout=2.0):
         if not self.running:
             return
         self.running = False
-        try:
-            if self.cap: self.cap.release()
-        except Exception:
-            pass
+        thr = self._video_thr
+        if thr is not None and thr is not threading.current_thread():
+            # o _video_loop liberta o cap ao sair; se o grab() estiver preso, liberta mais tarde
+            thr.join(timeout)
+            if thr.is_alive():
+                _dbg(f"[Aviso] C{self.camera_index}: captura ainda bloqueada; cap libertado à saída do loop")
+        elif thr is None:
+            try:
+                if self.cap: self.cap.release()
+            except Exception:
+                pass
         try:
             if self.audio_stream:
                 self.audio_stream.stop_stream()
@@ -188,10 +396,11 @@ class CameraStream:
 class MultiCamManager:
     def __init__(self, *, device_indices=None, backends=None, max_cameras=4,
                  width=None, height=None, fps=None, force_mjpg=False,
-                 enable_audio=False, debug=False):
+                 profiles=None, enable_audio=False, debug=False):
         """
-        device_indices: lista de índices (ex.: [0,1,2,3]); se None -> range(max_cameras)
+        device_indices: lista de índices/URLs (ex.: [0,1,"rtsp://..."]); se None -> range(max_cameras)
         backends: lista com 'dshow'/'msmf'/'v4l2'/'auto' por slot; se None -> default por SO
+        profiles: {índice_dispositivo: {"display"/"tx"/"record": {crop, scale, fps}}}
         """
         self.max_cameras = int(max_cameras)
         self.device_indices = device_indices or list(range(self.max_cameras))
@@ -202,32 +411,40 @@ class MultiCamManager:
         self.height = height
         self.fps = fps
         self.force_mjpg = force_mjpg
+        self.profiles = {str(k): v for k, v in (profiles or {}).items()}
         self.debug = debug
 
-        # normalizar tamanhos
-        if len(self.device_indices) < self.max_cameras:
-            self.device_indices += list(range(self.max_cameras - len(self.device_indices)))
+        # normalizar tamanhos (com device_indices explícitos não se inventam índices extra)
+        if device_indices:
+            self.device_indices = list(self.device_indices[:self.max_cameras])
         if len(self.backends) < self.max_cameras:
             self.backends += [None] * (self.max_cameras - len(self.backends))
 
     def start_all(self):
         self.streams = []
-        for slot in range(self.max_cameras):
+        streams = []
+        for slot in range(len(self.device_indices)):
             dev = self.device_indices[slot]
-            be  = self.backends[slot]
-            s = CameraStream(dev, width=self.width, height=self.height, fps=self.fps,
-                             backend=be, force_mjpg=self.force_mjpg,
-                             audio_index=dev, enable_audio=self.enable_audio, debug=self.debug)
-            if s.start():
-                self.streams.append(s)
-            else:
-                self.streams.append(None)
+            streams.append(None if dev is None else self._open(dev, self.backends[slot]))
+        self.streams = streams
         return self.streams
 
-    def get_frames(self):
+    def _open(self, dev, backend):
+        """abre e arranca uma fonte; None se falhar"""
+        dev = parse_source(dev)
+        s = CameraStream(dev, width=self.width, height=self.height, fps=self.fps,
+                         backend=backend, force_mjpg=self.force_mjpg,
+                         profiles=self.profiles.get(str(dev)),
+                         audio_index=dev if isinstance(dev, int) else None,
+                         # URLs não têm microfone local (None = microfone por omissão do PyAudio)
+                         enable_audio=self.enable_audio and isinstance(dev, int),
+                         debug=self.debug)
+        return s if s.start() else None
+
+    def get_frames(self, output="display", only_new=False):
         frames = []
         for s in self.streams:
-            frames.append(None if s is None else s.get_frame())
+            frames.append(None if s is None else s.get_frame(output, only_new=only_new))
         return frames
 
     def stop_all(self):
@@ -235,11 +452,20 @@ class MultiCamManager:
             if s is not None:
                 s.stop()
 
-def make_grid_2x2(frames, tile_size=(640, 360), text_overlay=True):
+def grid_layout(n, min_tiles=4):
+    """(colunas, linhas) para n tiles; nunca menos que 2x2"""
+    n = max(int(n), min_tiles)
+    cols = int(math.ceil(math.sqrt(n)))
+    rows = int(math.ceil(n / cols))
+    return cols, rows
+
+def make_grid(frames, tile_size=(640, 360), layout=None, text_overlay=True):
+    """grelha (colunas, linhas) com um tile por slot (tiles pretos quando não há feed)"""
+    cols, rows = layout or grid_layout(len(frames))
     tw, th = int(tile_size[0]), int(tile_size[1])
-    canvas = np.zeros((th*2, tw*2, 3), dtype=np.uint8)
-    for i in range(4):
-        r, c = i // 2, i % 2
+    canvas = np.zeros((th*rows, tw*cols, 3), dtype=np.uint8)
+    for i in range(cols*rows):
+        r, c = i // cols, i % cols
         x0, y0 = c*tw, r*th
         frm = frames[i] if i < len(frames) else None
         if frm is not None:
@@ -257,3 +483,6 @@ def make_grid_2x2(frames, tile_size=(640, 360), text_overlay=True):
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6,
                         (0,255,255) if frm is not None else (0,0,255), 2, cv2.LINE_AA)
     return canvas
+
+def make_grid_2x2(frames, tile_size=(640, 360), text_overlay=True):
+    return make_grid(frames[:4], tile_size=tile_size, layout=(2, 2), text_overlay=text_overlay)
@@ -20,13 +20,16 @@ class DataTX:
     envia frames codificados em JPEG
     reconnection automática 
     thread própria, interface com queue
+    opcional: publica cada JPEG numa jpeg_cache (reaproveitado pelos snapshots)
     """
-    def __init__(self, server_host, server_port, *, jpeg_quality=70, queue_size=100, debug=True, connect_timeout=5):
+    def __init__(self, server_host, server_port, *, jpeg_quality=70, queue_size=100, debug=True, connect_timeout=5,
+                 jpeg_cache=None):
         self.server_host = server_host
         self.server_port = int(server_port)
         self.jpeg_quality = int(jpeg_quality)
         self.debug = bool(debug)
         self.connect_timeout = int(connect_timeout)
+        self.jpeg_cache = jpeg_cache
 
         self._sock = None
         self._sender = None
@@ -94,7 +97,10 @@ class DataTX:
                 if not ok:
                     self._dbg("Falha a encode JPEG; frame descartado.")
                     continue
-                self._send_packet(cam_id, ts, enc.tobytes())
+                jpg_bytes = enc.tobytes()
+                if self.jpeg_cache is not None:
+                    self.jpeg_cache.put(cam_id, "tx", ts, jpg_bytes)
+                self._send_packet(cam_id, ts, jpg_bytes)
             except (BrokenPipeError, ConnectionResetError, OSError) as e:
                 self._dbg(f"Ligação perdida: {e}. Reconectando...")
                 try:
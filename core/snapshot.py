@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+import cv2
+
+from options_sub.tools.tools import save_snapshot, save_jpeg_bytes
+
+# origens que já codificam JPEG por câmara (reaproveitadas pelos snapshots)
+JPEG_SOURCES = ("tx", "record")
+
+class JpegCache:
+    """
+    guarda o último JPEG codificado por (câmara, origem)
+    escrito pelo TX/gravação, lido pelos snapshots (evita encode repetido)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def put(self, cam_id, source, ts, jpg_bytes):
+        with self._lock:
+            self._entries[(int(cam_id), source)] = (float(ts), jpg_bytes)
+
+    def get(self, cam_id, source):
+        """devolve (ts, bytes) ou None"""
+        with self._lock:
+            return self._entries.get((int(cam_id), source))
+
+class SnapshotService:
+    """
+    snapshots assíncronos: grelha, câmara individual (resolução total) e bursts de N frames
+    o pedido só mete um job na fila; encode + escrita em disco na thread própria
+    reaproveita JPEG já codificado (TX/gravação) quando é frame inteiro e recente
+    """
+    def __init__(self, manager, *, jpeg_cache=None, jpeg_quality=90, max_age=0.5,
+                 queue_size=32, frame_timeout=2.0, max_burst=100, debug=False):
+        self.manager = manager
+        self.jpeg_cache = jpeg_cache
+        self.jpeg_quality = int(jpeg_quality)
+        self.max_age = float(max_age)
+        self.frame_timeout = float(frame_timeout)
+        self.max_burst = int(max_burst)
+        self.debug = bool(debug)
+
+        self._worker = None
+        self._running = False
+        # False durante o stop(): não entram pedidos novos, os da fila são gravados
+        self._accepting = False
+        self._q = queue.Queue(maxsize=queue_size)
+
+    def _dbg(self, msg):
+        if self.debug:
+            ts = time.strftime("%H:%M:%S")
+            print(f"[{ts}] [Snapshot] {msg}", flush=True)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._accepting = True
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=10.0):
+        """
+        para de aceitar pedidos, grava o que está na fila (incl. o burst em curso)
+        e espera pela thread, para não sair a meio de uma escrita
+        """
+        if not self._running:
+            return
+        self._accepting = False
+        try:
+            # sentinela: o worker sai depois de esvaziar a fila
+            self._q.put(None, timeout=timeout)
+        except queue.Full:
+            self._dbg("Fila cheia no stop; a encerrar sem sentinela.")
+        if self._worker is not None:
+            self._worker.join(timeout)
+            if self._worker.is_alive():
+                self._dbg("Worker ainda ativo após timeout do stop.")
+        self._running = False
+
+    # pedidos (non-blocking)
+    def snapshot_grid(self, grid, path_prefix="cctv_grid"):
+        if grid is None:
+            print("[Snapshot] Sem imagem para guardar...")
+            return False
+        return self._submit(("grid", grid, path_prefix))
+
+    def snapshot_camera(self, cam_id, path_prefix="cctv"):
+        return self._submit(("burst", int(cam_id), 1, path_prefix))
+
+    def burst(self, cam_id, count, path_prefix="cctv"):
+        count = max(1, int(count))
+        if count > self.max_burst:
+            # um burst enorme prendia a thread de escrita (e os pedidos seguintes) durante horas
+            print(f"[Snapshot] Burst de {count} frames acima do máximo ({self.max_burst}); pedido descartado.")
+            return False
+        return self._submit(("burst", int(cam_id), count, path_prefix))
+
+    def _submit(self, job):
+        if not self._accepting:
+            print("[Snapshot] Serviço parado; pedido ignorado.")
+            return False
+        try:
+            self._q.put_nowait(job)
+            return True
+        except queue.Full:
+            print("[Snapshot] Fila cheia; pedido descartado.")
+            return False
+
+    def _loop(self):
+        while self._running:
+            try:
+                job = self._q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if job is None:
+                break
+            try:
+                if job[0] == "grid":
+                    _, grid, prefix = job
+                    save_snapshot(grid, path_prefix=prefix)
+                else:
+                    _, cam_id, count, prefix = job
+                    self._do_burst(cam_id, count, f"{prefix}_C{cam_id}")
+            except Exception as e:
+                self._dbg(f"Erro a guardar snapshot: {e}")
+        self._dbg("Loop de snapshots terminado.")
+
+    def _stream(self, cam_id):
+        streams = self.manager.streams
+        return streams[cam_id] if 0 <= cam_id < len(streams) else None
+
+    def _cached_source(self, cam_id, stream):
+        """origem com JPEG de frame inteiro e recente na cache (ou None)"""
+        if self.jpeg_cache is None:
+            return None
+        now = time.time()
+        for src in JPEG_SOURCES:
+            if not stream.is_full_frame(src):
+                continue
+            entry = self.jpeg_cache.get(cam_id, src)
+            if entry is not None and now - entry[0] <= self.max_age:
+                return src
+        return None
+
+    def _next_jpeg(self, cam_id, src, after_ts, deadline):
+        while self._running and time.time() < deadline:
+            entry = self.jpeg_cache.get(cam_id, src)
+            if entry is not None and entry[0] > after_ts:
+                return entry
+            time.sleep(0.005)
+        return None
+
+    def _next_frame(self, stream, deadline):
+        while self._running and time.time() < deadline:
+            frm = stream.get_frame("snapshot", only_new=True)
+            if frm is not None:
+                return frm
+            time.sleep(0.005)
+        return None
+
+    def _do_burst(self, cam_id, count, prefix):
+        stream = self._stream(cam_id)
+        if stream is None:
+            print(f"[Snapshot] Camara C{cam_id} indisponível.")
+            return
+        src = self._cached_source(cam_id, stream)
+        saved = 0
+        last_ts = 0.0
+        for i in range(count):
+            suffix = f"_{i:02d}" if count > 1 else ""
+            deadline = time.time() + self.frame_timeout
+            if src is not None:
+                entry = self._next_jpeg(cam_id, src, last_ts, deadline)
+                if entry is None:
+                    break
+                last_ts, data = entry
+                save_jpeg_bytes(data, path_prefix=prefix, suffix=suffix)
+            else:
+                frm = self._next_frame(stream, deadline)
+                if frm is None:
+                    break
+                ok, enc = cv2.imencode(".jpg", frm, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+                if not ok:
+                    self._dbg("Falha a encode JPEG; frame descartado.")
+                    continue
+                save_jpeg_bytes(enc.tobytes(), path_prefix=prefix, suffix=suffix)
+            saved += 1
+        if saved < count:
+            print(f"[Snapshot] C{cam_id}: só {saved}/{count} frames guardados (sem frames novos).")
+        self._dbg(f"C{cam_id}: {saved} frame(s) guardados (origem={src or 'captura'}).")
@@ -1,12 +1,14 @@
 import cv2
 import time
 import argparse
+import json
 import os
 
-from camera_handler.video_audio import MultiCamManager, make_grid_2x2
+from camera_handler.video_audio import make_grid, grid_layout, parse_source, parse_profile, OUTPUTS
+from camera_handler.registry import CameraRegistry
 from options_sub.subMain import SubConsole
-from options_sub.tools.tools import save_snapshot
 from core.dataTX import DataTX
+from core.snapshot import JpegCache, SnapshotService
 
 
 def _parse_list(s, conv=str):
@@ -15,10 +17,47 @@ def _parse_list(s, conv=str):
     return [conv(x.strip()) for x in s.split(",") if x.strip() != ""]
 
 
+def _load_profiles(path):
+    """lê os perfis por câmara (ROI/escala/FPS por saída) do cctv.config.json"""
+    if not path or not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+    except Exception as e:
+        print(f"[Main] Config inválida em {path}: {e}")
+        return {}
+    profiles = cfg.get("profiles") or {}
+    if not isinstance(profiles, dict):
+        print(f"[Main] Perfis inválidos em {path}: \"profiles\" tem de ser um objeto")
+        return {}
+
+    # valida já aqui: um perfil mau é ignorado em vez de rebentar o arranque/hot-plug
+    valid = {}
+    for dev, outs in profiles.items():
+        if not isinstance(outs, dict):
+            print(f"[Main] Perfil inválido para câmara {dev}: tem de ser um objeto por saída")
+            continue
+        cam = {}
+        for out, spec in outs.items():
+            if out not in OUTPUTS:
+                print(f"[Main] Perfil inválido para câmara {dev}: saída desconhecida '{out}'")
+                continue
+            try:
+                parse_profile(spec)
+            except ValueError as e:
+                print(f"[Main] Perfil inválido para câmara {dev}/{out}: {e}")
+                continue
+            cam[out] = spec
+        if cam:
+            valid[str(dev)] = cam
+    return valid
+
+
 def parse_args():
-    ap = argparse.ArgumentParser(description="CCTV 2x2 para Raspberry/Windows")
+    ap = argparse.ArgumentParser(description="CCTV em grelha para Raspberry/Windows")
 
-    ap.add_argument("--cams", type=int, default=4, help="Numero maximo de camaras (ate 4)")
+    ap.add_argument("--cams", type=int, default=4, help="Numero maximo de camaras (slots na grelha)")
     ap.add_argument("--width", type=int, default=640, help="Largura alvo por câmara")
     ap.add_argument("--height", type=int, default=360, help="Altura alvo por câmara")
     ap.add_argument("--fps", type=int, default=15, help="FPS alvo por câmara")
@@ -28,11 +67,19 @@ def parse_args():
     ap.add_argument("--debug", action="store_true", help="Logs detalhados")
 
     # para estabilizar no Windows / escolher por slot
-    ap.add_argument("--devs", type=str, default="", help="Lista de índices de câmara, ex.: 0,1,2,3")
+    ap.add_argument("--devs", type=str, default="",
+                    help="Lista de índices de câmara ou URLs, ex.: 0,1,rtsp://10.0.0.5/stream")
     ap.add_argument("--backends", type=str, default="",
-                    help="Lista por slot: dshow/msmf/v4l2/auto (ex.: dshow,msmf)")
+                    help="Lista por slot: dshow/msmf/v4l2/ffmpeg/auto (ex.: dshow,msmf)")
     ap.add_argument("--force-mjpg", action="store_true",
                     help="Forçar FOURCC MJPG nas câmeras (ajuda em USB/Windows)")
+    ap.add_argument("--config", type=str,
+                    default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cctv.config.json"),
+                    help="Ficheiro com perfis por câmara (ROI, escala, FPS)")
+    ap.add_argument("--hotplug", action="store_true",
+                    help="Linux: vigiar /dev/video* e ligar/desligar câmaras em runtime")
+    ap.add_argument("--fps-budget", type=float, default=0,
+                    help="Total de FPS de captura repartido por todas as câmaras (0 = sem limite)")
 
     return ap.parse_args()
 
@@ -41,32 +88,42 @@ def main():
     args = parse_args()
 
     # listas opcionais
-    devs = _parse_list(args.devs, int)
+    devs = _parse_list(args.devs, parse_source)
     backs = _parse_list(args.backends, str)
+    profiles = _load_profiles(args.config)
 
     # 1
     # Câmaras
-    m = MultiCamManager(
+    m = CameraRegistry(
         device_indices=devs if devs else None,
         backends=backs if backs else None,
-        max_cameras=min(4, args.cams),
+        max_cameras=max(1, args.cams),
         width=args.width,
         height=args.height,
         fps=args.fps,
         force_mjpg=args.force_mjpg,
+        profiles=profiles,
         # enable_audio=False,  # como tinhas, fica ligado
         enable_audio=True,
         debug=args.debug,
+        hotplug=args.hotplug,
+        fps_budget=args.fps_budget,
     )
     streams = m.start_all()  # mantém como tinhas
 
+    # snapshots assíncronos (reaproveitam os JPEG já codificados pelo TX)
+    jpeg_cache = JpegCache()
+    snaps = SnapshotService(m, jpeg_cache=jpeg_cache, debug=args.debug)
+    snaps.start()
+
     # 2
     # Networking (inicialmente desligado até o utilizador ligar no menu)
     tx = None
     tx_enabled = False
 
     if args.server:
-        tx = DataTX(args.server, args.port, jpeg_quality=args.quality, debug=True)
+        tx = DataTX(args.server, args.port, jpeg_quality=args.quality, debug=True,
+                    jpeg_cache=jpeg_cache)
         # não inicia já; fica à espera do toggle
 
     # 3
@@ -94,7 +151,8 @@ def main():
         nonlocal tx_enabled, tx
         if tx is None:
             if args.server:
-                tx = DataTX(args.server, args.port, jpeg_quality=args.quality, debug=True)
+                tx = DataTX(args.server, args.port, jpeg_quality=args.quality, debug=True,
+                            jpeg_cache=jpeg_cache)
             else:
                 print("[Main] Sem servidor configurado (--server)...")
                 return
@@ -108,12 +166,27 @@ def main():
             print("[Main] Transmissão para server: DESLIGADA!")
 
     def do_snapshot():
-        # faz a snapshot
-        grid = last_grid.copy() if last_grid is not None else None
-        if grid is None:
-            print("[Main] Sem imagem para guardar...")
-            return
-        save_snapshot(grid, path_prefix="cctv_grid")
+        # a grelha é nova a cada frame, não precisa de cópia; encode/escrita em background
+        snaps.snapshot_grid(last_grid, path_prefix="cctv_grid")
+
+    def do_cam_snapshot(cam_id):
+        snaps.snapshot_camera(cam_id)
+
+    def do_burst(cam_id, count):
+        snaps.burst(cam_id, count)
+
+    def add_source(src):
+        slot = m.add_source(src)
+        if slot is None:
+            print(f"[Main] Não foi possível adicionar {src}")
+        else:
+            print(f"[Main] Câmara {src} no slot {slot}")
+
+    def remove_source(arg):
+        # número = slot; resto = URL
+        slot = m.remove_slot(int(arg), forget=True) if arg.isdigit() else m.remove_source(arg, forget=True)
+        if slot is None:
+            print(f"[Main] Nada para remover em {arg}")
 
     def reload_cams():
         print("[Main] A recarregar camaras...")
@@ -131,6 +204,10 @@ def main():
         on_snapshot=do_snapshot,
         on_reload_cams=reload_cams,
         on_quit=do_quit,
+        on_cam_snapshot=do_cam_snapshot,
+        on_burst=do_burst,
+        on_add_source=add_source,
+        on_remove_source=remove_source,
     )
     menu.start()
 
@@ -138,22 +215,22 @@ def main():
     # Loop de UI
     running = True
     last_grid = None
-    tile_size = (args.width, args.height)
+    # a grelha mantém o tamanho de um 2x2; com mais câmaras os tiles encolhem
+    canvas_size = (args.width * 2, args.height * 2)
 
     print("[Main] Controlo rapido: 'f' fullscreen, 't' TX (Transmitir), 's' snapshot, 'q' sair.")
     while running:
-        frames = m.get_frames()
-        # enviar frames (se ativo)
+        frames = m.get_frames("display")
+        # enviar frames (se ativo); só frames novos, já recortados/decimados pelo perfil "tx"
         if tx_enabled and tx is not None:
-            for cam_id, frm in enumerate(frames):
+            for cam_id, frm in enumerate(m.get_frames("tx", only_new=True)):
                 if frm is not None:
                     tx.send_frame(cam_id, frm)
 
-        # compor grid para visualização
-        # garantir tamanho de 4 slots
-        while len(frames) < 4:
-            frames.append(None)
-        grid = make_grid_2x2(frames, tile_size=tile_size, text_overlay=True)
+        # compor grid para visualização (nunca menos de 2x2)
+        layout = grid_layout(len(frames))
+        tile_size = (canvas_size[0] // layout[0], canvas_size[1] // layout[1])
+        grid = make_grid(frames, tile_size=tile_size, layout=layout, text_overlay=True)
         last_grid = grid
 
         cv2.imshow(window, grid)
@@ -171,6 +248,7 @@ def main():
     print("[Main] A encerrar...")
     if tx is not None:
         tx.stop()
+    snaps.stop()
     m.stop_all()
     cv2.destroyAllWindows()
     print("[Main] Terminado.")
@@ -6,10 +6,15 @@ class SubConsole:
     cria menu na consola minimalista a correr em thread própria
     interage com 'main.py' através de callbacks
     """
-    def __init__(self, *, on_toggle_fullscreen, on_toggle_tx, on_snapshot, on_reload_cams, on_quit):
+    def __init__(self, *, on_toggle_fullscreen, on_toggle_tx, on_snapshot, on_reload_cams, on_quit,
+                 on_cam_snapshot=None, on_burst=None, on_add_source=None, on_remove_source=None):
         self.on_toggle_fullscreen = on_toggle_fullscreen
         self.on_toggle_tx = on_toggle_tx
         self.on_snapshot = on_snapshot
+        self.on_cam_snapshot = on_cam_snapshot
+        self.on_burst = on_burst
+        self.on_add_source = on_add_source
+        self.on_remove_source = on_remove_source
         self.on_reload_cams = on_reload_cams
         self.on_quit = on_quit
 
@@ -31,19 +36,49 @@ class SubConsole:
         print("[F] - Alternar Fullscreen")
         print("[T] - Ligar/Desligar transmissão para servidor")
         print("[S] - Guardar snapshot (grid)")
+        if self.on_cam_snapshot is not None:
+            print("[C <cam>] - Snapshot de uma câmara (resolução total)")
+        if self.on_burst is not None:
+            print("[B <cam> <n>] - Burst de N frames de uma câmara")
         print("[R] - Recarregar câmaras")
+        if self.on_add_source is not None:
+            print("[A <idx|url>] - Adicionar câmara (índice ou URL RTSP/HTTP)")
+        if self.on_remove_source is not None:
+            print("[D <slot|url>] - Remover câmara (slot ou URL)")
         print("[Q] - Sair")
         print("x============================================x")
 
+    def _int_args(self, cmd, n):
+        """lê n inteiros depois do comando (ex.: 'b 0 10'); None se inválido"""
+        parts = cmd.split()[1:]
+        try:
+            vals = [int(p) for p in parts[:n]]
+        except ValueError:
+            vals = []
+        if len(vals) != n:
+            print("Argumentos inválidos...")
+            return None
+        return vals
+
+    def _str_arg(self, raw):
+        """texto depois do comando, sem mexer em maiúsculas (ex.: 'a rtsp://...')"""
+        parts = raw.split(None, 1)
+        if len(parts) < 2:
+            print("Argumentos inválidos...")
+            return None
+        return parts[1].strip()
+
     def _loop(self):
         self._print_menu()
         while self._running:
             try:
-                cmd = input("> ").strip().lower()
+                raw = input("> ").strip()
             except EOFError:
                 break
-            if not cmd:
+            if not raw:
                 continue
+            # URLs são sensíveis a maiúsculas: só o comando é normalizado
+            cmd = raw.lower()
             c = cmd[0]
             if c == 'f':
                 self.on_toggle_fullscreen()
@@ -51,6 +86,22 @@ class SubConsole:
                 self.on_toggle_tx()
             elif c == 's':
                 self.on_snapshot()
+            elif c == 'c' and self.on_cam_snapshot is not None:
+                args = self._int_args(cmd, 1)
+                if args is not None:
+                    self.on_cam_snapshot(*args)
+            elif c == 'b' and self.on_burst is not None:
+                args = self._int_args(cmd, 2)
+                if args is not None:
+                    self.on_burst(*args)
+            elif c == 'a' and self.on_add_source is not None:
+                arg = self._str_arg(raw)
+                if arg is not None:
+                    self.on_add_source(arg)
+            elif c == 'd' and self.on_remove_source is not None:
+                arg = self._str_arg(raw)
+                if arg is not None:
+                    self.on_remove_source(arg)
             elif c == 'r':
                 self.on_reload_cams()
             elif c == 'q':
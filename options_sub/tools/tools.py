@@ -1,10 +1,19 @@
 import cv2
 import time
 
-def save_snapshot(image, path_prefix="snapshot"):
+def save_snapshot(image, path_prefix="snapshot", suffix=""):
     """vai guardar uma imagem com timestamp"""
     ts = time.strftime("%Y%m%d-%H%M%S")
-    fname = f"{path_prefix}_{ts}.jpg"
+    fname = f"{path_prefix}_{ts}{suffix}.jpg"
     cv2.imwrite(fname, image)
     print(f"[Tools] Snapshot salvo em {fname}")
-    return fname
\ No newline at end of file
+    return fname
+
+def save_jpeg_bytes(jpg_bytes, path_prefix="snapshot", suffix=""):
+    """guarda um JPEG já codificado (sem re-encode) com timestamp"""
+    ts = time.strftime("%Y%m%d-%H%M%S")
+    fname = f"{path_prefix}_{ts}{suffix}.jpg"
+    with open(fname, "wb") as f:
+        f.write(jpg_bytes)
+    print(f"[Tools] Snapshot salvo em {fname}")
+    return fname